@@ -1,9 +1,22 @@
 import typing
 from abc import abstractmethod
-
-from database import Customer, DataError, IStore, all_items, Status
+from collections import Counter
+
+from database import (
+    Customer,
+    DataError,
+    IStore,
+    Order,
+    all_item_names,
+    all_items,
+    date_key,
+    Status,
+)
 from fake import fake_customer, fake_order
 
+import functools
+import operator
+import sys
 import time
 
 
@@ -23,8 +36,11 @@ cli_context: Context = None
 
 
 # a parent class for all commands
-# it will register all commands in a dictionary
+# all_commands is the registry of every command by name, filled in once below the command classes
 class Command:
+    # commands are long lived singletons, slots avoid a __dict__ per instance
+    __slots__ = ("name", "description")
+
     name: str
     description: str
 
@@ -33,7 +49,6 @@ class Command:
     def __init__(self, name: str, description: str):
         self.name = name
         self.description = description
-        self.all_commands[name] = self
 
     @abstractmethod
     def execute(self, args: typing.List[str]) -> typing.Optional[str]:
@@ -42,6 +57,8 @@ class Command:
 
 # a help command to direct users to other commands and show their usage
 class HelpCommand(Command):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__("help", "Prints a help message, usage: help <command>?")
 
@@ -51,14 +68,14 @@ class HelpCommand(Command):
             if command:
                 return f"{command.name}: {command.description}"
             return f"Command {args[0]} not found"
-        print(
-            "Available commands: " + ", ".join([c for c in Command.all_commands.keys()])
-        )
+        print(available_commands_str)
         return None
 
 
 # a command to view all orders, for the day or all time
 class ViewActiveOrdersCommand(Command):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(
             "view_orders",
@@ -77,27 +94,46 @@ class ViewActiveOrdersCommand(Command):
         )
         if not orders or len(orders) == 0:
             return "No orders found"
-        orders.sort(key=lambda x: (-x.status.value, x.time))
-
-        active_orders = []
-        completed_orders = []
+        orders.sort(key=operator.attrgetter("time"))
 
+        # group the orders by status, each group stays sorted by time
+        orders_by_status = {status: [] for status in Status}
         for order in orders:
-            if order.status == Status.DONE:
-                completed_orders.append(order)
-            else:
-                active_orders.append(order)
-
-        print("Today's orders:" if not all_time else "All time orders:")
-        print("Active orders:")
-        print("\n".join([str(order) for order in active_orders]))
-        print("Completed orders:")
-        print("\n".join([str(order) for order in completed_orders]))
+            orders_by_status[order.status].append(order)
+
+        # active orders are listed from the furthest along status to the newest
+        active_orders = (
+            orders_by_status[Status.CANCELLED]
+            + orders_by_status[Status.IN_PROGRESS]
+            + orders_by_status[Status.PENDING]
+        )
+        completed_orders = orders_by_status[Status.DONE]
+
+        # written in one go, as there can be a lot of orders to print
+        sys.stdout.write(
+            ("Today's orders:\n" if not all_time else "All time orders:\n")
+            + "Active orders:\n"
+            + "\n".join(map(str, active_orders))
+            + "\nCompleted orders:\n"
+            + "\n".join(map(str, completed_orders))
+            + "\n"
+        )
+        sys.stdout.flush()
         return None
 
 
+# parses a date in the format YYYY-MM-DD to a timestamp at the start of that day
+# raises ValueError if the date is invalid
+# strptime is slow, so dates are cached as the same few days tend to be asked for repeatedly
+@functools.lru_cache(maxsize=256)
+def parse_date(date_str: str) -> float:
+    return time.mktime(time.strptime(date_str, "%Y-%m-%d"))
+
+
 # provides a summary of the day's sales, if no argument is provided, it will show today's saless
 class DailySummaryCommand(Command):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(
             "daily_summary",
@@ -108,14 +144,14 @@ class DailySummaryCommand(Command):
         date = time.time()
         if len(args) > 0:
             try:
-                t = time.strptime(args[0], "%Y-%m-%d")
-                date = time.mktime(t)
+                date = parse_date(args[0])
             except ValueError:
                 return "Invalid date format, use YYYY-MM-DD"
 
-        time_str = time.strftime("%Y-%m-%d", time.localtime(date))
+        time_str = date_key(date)
 
-        orders = cli_context.store.get_date_orders(date)
+        store = cli_context.store
+        orders = store.get_date_orders(date)
         if not orders or len(orders) == 0:
             return f"No orders on {time_str}"
 
@@ -123,20 +159,19 @@ class DailySummaryCommand(Command):
         total_sales = 0
         total_delivery_sales = 0
 
-        all_items_sold = dict()
+        all_items_sold = Counter()
+        count_items_sold = all_items_sold.update
+        done = Status.DONE
 
         for order in orders:
-            if order.status != Status.DONE:
+            if order.status != done:
                 continue
             total_orders += 1
             cost = order.cost()
             total_sales += cost.cost_before_gst
             if order.is_home_delivery:
                 total_delivery_sales += cost.cost_before_gst
-            for item, count in order.items.items():
-                if item not in all_items_sold:
-                    all_items_sold[item] = 0
-                all_items_sold[item] += count
+            count_items_sold(order.items)
 
         print(f"Summary for {time_str}:")
         print(f"Total orders: {total_orders}")
@@ -150,8 +185,14 @@ class DailySummaryCommand(Command):
         return None
 
 
+# the most records the fake data commands will generate at once, to avoid running out of memory
+max_fake_count = 10_000_000
+
+
 # testing, just generates a lot of customers
 class FakeCustomersCommand(Command):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(
             "fake_customers",
@@ -162,21 +203,25 @@ class FakeCustomersCommand(Command):
         if len(args) < 1:
             return "Usage: fake_customers <count>"
 
-        try:
-            count = int(args[0])
-            for _ in range(count):
-                customer = fake_customer()
-                cli_context.store.get_or_add_customer(customer.phone, customer.name)
-            return f"Added {count} customers"
-        except ValueError:
+        if not args[0].isdecimal():
             return "Invalid count"
+        count = int(args[0])
+        if count > max_fake_count:
+            return f"Count too large, the maximum is {max_fake_count}"
 
-
-import random
+        # fake customers are added without loyalty membership, the same as adding them one at a time
+        customers = []
+        for _ in range(count):
+            customer = fake_customer()
+            customers.append(Customer(customer.name, customer.phone))
+        cli_context.store.add_customers_bulk(customers)
+        return f"Added {count} customers"
 
 
 # testing, just generates a lot of orders
 class FakeOrdersCommand(Command):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(
             "fake_orders",
@@ -187,21 +232,30 @@ class FakeOrdersCommand(Command):
         if len(args) < 1:
             return "Usage: fake_orders <count>"
 
-        try:
-            count = int(args[0])
-            for _ in range(count):
-                items, home_delivery, order_time = fake_order()
-                phone_random = random.choice(cli_context.store.customer_phones())
-                customer = cli_context.store.get_customer(phone_random)
-                order = cli_context.store.add_order(customer, items, home_delivery)
-                order.time = order_time
-            return f"Added {count} orders"
-        except ValueError:
+        if not args[0].isdecimal():
             return "Invalid count"
+        count = int(args[0])
+        if count > max_fake_count:
+            return f"Count too large, the maximum is {max_fake_count}"
+
+        store = cli_context.store
+        # pick every order's customer in one call rather than once per order
+        customers = store.random_customers(count)
+        orders = []
+        for customer in customers:
+            items, home_delivery, order_time = fake_order()
+            order = Order(customer, items)
+            order.is_home_delivery = home_delivery
+            order.time = order_time
+            orders.append(order)
+        store.add_orders_bulk(orders)
+        return f"Added {count} orders"
 
 
 # sets an order as in progress
 class MarkInProgressCommand(Command):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(
             "mark_in_progress",
@@ -213,27 +267,23 @@ class MarkInProgressCommand(Command):
             return "Usage: mark_in_progress <order_id>"
 
         order_id_str = args[0]
-        try:
-            order_id = int(order_id_str)
-            order = next(
-                (
-                    order
-                    for order in cli_context.store.get_all_time_orders()
-                    if order.id == order_id
-                ),
-                None,
-            )
-        except ValueError:
+        # order ids are always positive whole numbers, so anything else can be rejected early
+        if not order_id_str.isdecimal():
             return "Invalid order id"
+        order_id = int(order_id_str)
+        order = cli_context.store.get_order_by_id(order_id)
         if not order:
             return "Order not found"
 
         order.mark_in_progress()
+        cli_context.store.mark_dirty()
         return f"Marked order {order_id} as in progress"
 
 
 # sets an order as cancelled
 class MarkCancelledCommand(Command):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(
             "mark_cancelled",
@@ -245,27 +295,23 @@ class MarkCancelledCommand(Command):
             return "Usage: mark_cancelled <order_id>"
 
         order_id_str = args[0]
-        try:
-            order_id = int(order_id_str)
-            order = next(
-                (
-                    order
-                    for order in cli_context.store.get_all_time_orders()
-                    if order.id == order_id
-                ),
-                None,
-            )
-        except ValueError:
+        # order ids are always positive whole numbers, so anything else can be rejected early
+        if not order_id_str.isdecimal():
             return "Invalid order id"
+        order_id = int(order_id_str)
+        order = cli_context.store.get_order_by_id(order_id)
         if not order:
             return "Order not found"
 
         order.mark_cancelled()
+        cli_context.store.mark_dirty()
         return f"Marked order {order_id} as cancelled"
 
 
 # sets an order as done
 class MarkDoneCommand(Command):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(
             "mark_done",
@@ -277,27 +323,23 @@ class MarkDoneCommand(Command):
             return "Usage: mark_done <order_id>"
 
         order_id_str = args[0]
-        try:
-            order_id = int(order_id_str)
-            order = next(
-                (
-                    order
-                    for order in cli_context.store.get_all_time_orders()
-                    if order.id == order_id
-                ),
-                None,
-            )
-        except ValueError:
+        # order ids are always positive whole numbers, so anything else can be rejected early
+        if not order_id_str.isdecimal():
             return "Invalid order id"
+        order_id = int(order_id_str)
+        order = cli_context.store.get_order_by_id(order_id)
         if not order:
             return "Order not found"
 
         order.mark_done()
+        cli_context.store.mark_dirty()
         return f"Marked order {order_id} as completed"
 
 
 # adds a new customer
 class AddCustomerCommand(Command):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(
             "add_customer", "Add a new customer, usage: add_customer <phone> <name>"
@@ -319,6 +361,8 @@ class AddCustomerCommand(Command):
 
 # sets a customer as a loyalty member or not
 class SetCustomerLoyaltyCommand(Command):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(
             "set_loyalty",
@@ -335,17 +379,23 @@ class SetCustomerLoyaltyCommand(Command):
         if not customer:
             return "Customer not found"
 
-        customer.loyalty_member = loyalty_status
+        customer.set_loyalty_member(loyalty_status)
+        cli_context.store.mark_dirty()
         return f"Set loyalty status for {phone} to {loyalty_status}"
 
 
 # adds a new order, prompts the user for items and quantities and additional information
+# note: no __slots__ here, cached_property stores its value in the instance __dict__
 class StartOrderCommand(Command):
-    available_item_str = ",\n".join([f"\t- {item}" for item in all_items])
-
     def __init__(self):
         super().__init__("start_order", "Start a new order for a customer")
 
+    # the menu listing shown when an unknown item is entered
+    # only built the first time it is needed, so other commands don't pay for it at startup
+    @functools.cached_property
+    def available_item_str(self) -> str:
+        return ",\n".join(f"\t- {item}" for item in all_items)
+
     def execute(self, args: typing.List[str]) -> typing.Optional[str]:
         if len(args) < 1:
             return "Usage: start_order <phone>"
@@ -355,12 +405,12 @@ class StartOrderCommand(Command):
         if not customer:
             return "Customer not found"
 
-        items = dict()
+        items = Counter()
         while True:
             item = input("Enter item name or press enter to finish: ")
             if item == "":
                 break
-            if item not in all_items:
+            if item not in all_item_names:
                 print(f"Unknown item `{item}`")
                 print(f"Available items are:\n{self.available_item_str}")
                 continue
@@ -369,10 +419,7 @@ class StartOrderCommand(Command):
                 if count < 1:
                     print("Invalid count, cannot add negative or zero items")
                     continue
-                if item not in items:
-                    items[item] = count
-                else:
-                    items[item] += count
+                items[item] += count
             except ValueError:
                 print("Invalid count")
                 continue
@@ -382,7 +429,7 @@ class StartOrderCommand(Command):
             print(f"\t- {item} x {count}")
 
         wants_delivery = input("Is this a home delivery? (y/n): ").lower() == "y"
-        order = cli_context.store.add_order(customer, items, wants_delivery)
+        order = cli_context.store.add_order(customer, dict(items), wants_delivery)
 
         print(f"Order details:\n{order}")
         return
@@ -390,6 +437,8 @@ class StartOrderCommand(Command):
 
 # gives the full order information for a given order id
 class OrderInfoCommand(Command):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(
             "order_info", "Get information about an order, usage: order_info <order_id>"
@@ -400,26 +449,37 @@ class OrderInfoCommand(Command):
             return "Usage: order_info <order_id>"
 
         order_id_str = args[0]
-        try:
-            order_id = int(order_id_str)
-            order = next(
-                (
-                    order
-                    for order in cli_context.store.get_all_time_orders()
-                    if order.id == order_id
-                ),
-                None,
-            )
-        except ValueError:
+        # order ids are always positive whole numbers, so anything else can be rejected early
+        if not order_id_str.isdecimal():
             return "Invalid order id"
+        order_id = int(order_id_str)
+        order = cli_context.store.get_order_by_id(order_id)
         if not order:
             return "Order not found"
         return order.full_repr()
 
 
-# register all commands
-for c in Command.__subclasses__():
-    c()
+# all commands available in the cli, in the order they are listed by `help`
+commands = (
+    HelpCommand(),
+    ViewActiveOrdersCommand(),
+    DailySummaryCommand(),
+    FakeCustomersCommand(),
+    FakeOrdersCommand(),
+    MarkInProgressCommand(),
+    MarkCancelledCommand(),
+    MarkDoneCommand(),
+    AddCustomerCommand(),
+    SetCustomerLoyaltyCommand(),
+    StartOrderCommand(),
+    OrderInfoCommand(),
+)
+
+# register all commands by name
+Command.all_commands = {command.name: command for command in commands}
+
+# the command list printed by `help`, built once as commands are only registered at import
+available_commands_str = "Available commands: " + ", ".join(Command.all_commands)
 
 
 initial_prompt = """Welcome to the pizza store command line interface
@@ -448,11 +508,51 @@ help <command>? - get help on a specific command, i.e. `help add_customer`
 """
 
 
-# the main loop for the command line interface
-def loop(context: Context):
-    global cli_context
-    old_context = cli_context
-    cli_context = context
+# runs a single line of input as a command
+# returns False if the user asked to exit, True otherwise
+def run_command(command_string: str) -> bool:
+    # splitting on any whitespace ignores repeated spaces, tabs and blank lines
+    # only the command word is split off first, the arguments are split once the command is known
+    split_command = command_string.split(maxsplit=1)
+    if not split_command:
+        return True
+    command_word = split_command[0]
+    # exit is a default command to exit the program
+    if command_word == "exit":
+        return False
+
+    command = Command.all_commands.get(command_word)
+    if command is None:
+        print(
+            "Unknown command, use `help` to see available commands\nand `exit` to exit"
+        )
+        return True
+
+    command_args = split_command[1].split() if len(split_command) > 1 else []
+    try:
+        message = command.execute(command_args)
+    except KeyboardInterrupt:
+        print("\nCommand interrupted\n")
+        message = None
+    except:
+        print("Unexpected error from command")
+        message = None
+    if message:
+        print(message)
+    return True
+
+
+# saves any changes the store held back, a failed save is reported instead of ending the program
+def flush_store():
+    try:
+        cli_context.store.flush()
+    except Exception as e:
+        print(f"Unable to save the store: {e}")
+
+
+# reads commands from the user one prompt at a time
+# the store is flushed after each command, as the user may leave the program idle at the prompt
+def interactive_loop():
     exited_once = False
     print(initial_prompt)
     while True:
@@ -466,30 +566,28 @@ def loop(context: Context):
             print("\nPress Ctrl+C again to exit")
             continue
         exited_once = False
-        split_command = command_string.split(" ")
-        command_word = split_command[0]
-        command_args = split_command[1:]
-        # exit is a default command to exit the program
-        if command_word == "exit":
+        if not run_command(command_string):
             break
+        flush_store()
 
-        found = False
-        if command_word in Command.all_commands:
-            found = True
-            try:
-                message = Command.all_commands[command_word].execute(command_args)
-            except KeyboardInterrupt:
-                print("\nCommand interrupted\n")
-                message = None
-            except:
-                print("Unexpected error from command")
-                message = None
-            if message:
-                print(message)
-
-        if not found:
-            print(
-                "Unknown command, use `help` to see available commands\nand `exit` to exit"
-            )
 
+# reads commands from piped or redirected input, e.g. a script of commands
+# iterating sys.stdin lets the os buffer the input instead of prompting for each line
+# commands run back to back, so saves are left to the store's save_interval and the flush at the end
+def piped_loop():
+    for command_string in sys.stdin:
+        if not run_command(command_string.rstrip("\r\n")):
+            break
+
+
+# the main loop for the command line interface
+def loop(context: Context):
+    global cli_context
+    old_context = cli_context
+    cli_context = context
+    if sys.stdin.isatty():
+        interactive_loop()
+    else:
+        piped_loop()
+    flush_store()
     cli_context = old_context
@@ -1,10 +1,53 @@
 from abc import ABC, abstractmethod
+import atexit
+import contextlib
 from enum import Enum
 import typing
 import time
+import functools
 import os
 import json
 import random
+import re
+
+# orjson is optional, it is a lot faster than the json module for saving and loading the store
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# called by the serializer for objects it doesn't know how to serialize
+# any object with a toJSON method is serialized as whatever that returns
+def json_default(obj):
+    if hasattr(obj, "toJSON"):
+        return obj.toJSON()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# serializes an object to JSON as utf-8 bytes, using orjson if it is installed
+# objects in obj are serialized with json_default as they are reached
+def dump_json(obj) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=json_default)
+        except TypeError:
+            # orjson can't serialize integers outside the 64-bit range, the json module can
+            pass
+    return json.dumps(obj, default=json_default).encode("utf-8")
+
+
+# runs of 19 or more digits, the shortest integers that might not fit in 64 bits
+long_digit_run = re.compile(rb"\d{19,}")
+
+
+# deserializes JSON bytes, using orjson if it is installed
+# orjson loads integers outside the 64-bit range as floats, which would change their values,
+# so the json module is used for any data that could contain one
+def load_json(data: bytes):
+    if orjson is not None and not long_digit_run.search(data):
+        return orjson.loads(data)
+    return json.loads(data)
 
 
 # Represents the status of an order
@@ -19,13 +62,44 @@ class Status(Enum):
     DONE = 4
 
 
+# the name of each status, Enum.name is a property lookup which adds up when printing many orders
+status_names: dict[Status, str] = {status: status.name for status in Status}
+# and the reverse, used when loading orders instead of Status[name]
+statuses_by_name: dict[str, Status] = {status.name: status for status in Status}
+
+
+# formats the local date of a quarter hour (number of 15 minute periods since the epoch)
+# every utc offset is a multiple of 15 minutes, so the local date never changes within a quarter hour
+# and the formatted string can be cached for all timestamps in it
+@functools.lru_cache(maxsize=1024)
+def quarter_hour_date_key(quarter_hour: int) -> str:
+    return time.strftime("%Y-%m-%d", time.localtime(quarter_hour * 900))
+
+
+# returns the local date of a timestamp as a string, e.g. "2021-09-01"
+# used to group orders by the day they were placed
+def date_key(t: float) -> str:
+    return quarter_hour_date_key(int(t // 900))
+
+
+# formats a timestamp (in whole seconds) as a local date and time, e.g. "2021-09-01 12:00:00"
+# cached as the same orders are printed over and over when viewing them
+@functools.lru_cache(maxsize=4096)
+def format_timestamp(t: int) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t))
+
+
 # Represents an item in the menu
 # name: The name of the item
 # price: The price of the item
+# price_str: The price formatted to 2 decimal places, formatted once as it is printed with every order
 class Item:
+    __slots__ = ("name", "price", "price_str")
+
     def __init__(self, name, price):
         self.name = name
         self.price = price
+        self.price_str = f"{price:.2f}"
 
     def __str__(self):
         return f"{self.name} - {self.price}"
@@ -41,12 +115,20 @@ all_items = {
     "Margherita": Item("Margherita", 18.50),
 }
 
+# names of all items on the menu, used to validate item names entered by the user
+all_item_names: frozenset[str] = frozenset(all_items)
+
+# the price of each item by name, avoids looking up the Item object when costing orders
+item_prices: dict[str, float] = {name: item.price for name, item in all_items.items()}
+
 
 # A customer who can place orders, identified by their phone number
 # name: The name of the customer
 # phone: The phone number of the customer
 # loyalty_member: Whether the customer is a loyalty member or not, and thus eligible for discounts
 class Customer:
+    __slots__ = ("name", "phone", "loyalty_member")
+
     def __init__(self, name: str, phone: str):
         self.name = name
         self.phone = phone
@@ -63,15 +145,31 @@ class Customer:
     def set_loyalty_member(self, is_member: bool):
         self.loyalty_member = is_member
 
+    # serializes the customer to a JSON object for saving/loading
+    def toJSON(self):
+        return {
+            "name": self.name,
+            "phone": self.phone,
+            "loyalty_member": self.loyalty_member,
+        }
+
+
+# the cost of home delivery
+delivery_fee = 8.0
+# loyalty members get this discount on orders costing more than discount_threshold before delivery
+discount_rate = 0.05
+discount_threshold = 100
+gst_rate = 0.1
+
 
-# class to calculate the cost of an order and give each component of the cost
+# the cost of an order and each component of the cost, see Order.calculate_cost
 # raw_cost: the total cost of all items in the order
 # discount: the discount applied to the order
 # delivery_cost: the cost of delivery if applicable
 # cost_before_gst: the total cost before GST
 # gst: the GST applied to the total cost
 # cost_after_gst: the total cost after GST
-class OrderCost:
+class OrderCost(typing.NamedTuple):
     raw_cost: float
     discount: float
     delivery_cost: float
@@ -79,51 +177,9 @@ class OrderCost:
     gst: float
     cost_after_gst: float
 
-    def __init__(self):
-        self.raw_cost = 0.0
-        self.discount = 0.0
-        self.delivery_cost = 0.0
-        self.cost_before_gst = 0.0
-        self.gst = 0.0
-        self.cost_after_gst = 0.0
-
-    # adds one or more items by name and quantity to the order
-    def add_items(self, item_name: str, quantity: int):
-        self.raw_cost += all_items[item_name].price * quantity
-
-    # makes the delivery cost $8.0 if the order is a home delivery
-    def add_deliver_cost(self):
-        self.delivery_cost = 8.0
-
-    # adds a 5% discount to the order
-    def add_discount(self):
-        self.discount = self.raw_cost * 0.05
-
-    # checks if the discount can be applied to the order
-    def can_discount_apply(self):
-        return self.raw_cost > 100
-
-    # calculates the cost before GST
-    def calculate_pre_gst_cost(self):
-        self.cost_before_gst = self.raw_cost - self.discount + self.delivery_cost
-
-    # calculates the GST
-    # note: will call calculate_pre_gst_cost() to ensure cost_before_gst is up to date
-    def calculate_gst(self):
-        self.calculate_pre_gst_cost()
-        self.gst = self.cost_before_gst * 0.1
-
-    # calculates the total cost of the order
-    # note: will call calculate_gst() to ensure gst is up to date
-    def calculate_total_cost(self):
-        self.calculate_gst()
-        self.cost_after_gst = self.cost_before_gst + self.gst
-
-    # returns the total cost of the order after GST (customer payment amount)
-    # note: will call calculate_total_cost() to ensure cost_after_gst is up to date
-    def get_total_cost(self):
-        self.calculate_total_cost()
-        return self.cost_after_gst
+
+# the id given to the first order in a new store, later orders count up from here
+first_order_id = 1000
 
 
 # Represents an order placed by a customer
@@ -133,16 +189,37 @@ class OrderCost:
 # status: The status of the order
 # items: A dictionary of items in the order and their quantities
 # is_home_delivery: Whether the order is a home delivery or not
-# id: A unique identifier for the order
+# id: A unique identifier for the order, given by the store when the order is added
+# cached_cost: The last OrderCost calculated for the order, reused while its inputs are unchanged
 class Order:
-    def __init__(self, customer: Customer, items: dict[str, int]):
+    # stores can hold a lot of orders, slots keep each one smaller than a __dict__ would
+    __slots__ = (
+        "customer",
+        "time",
+        "completed_time",
+        "status",
+        "items",
+        "is_home_delivery",
+        "id",
+        "cached_cost",
+        "cached_cost_key",
+    )
+
+    def __init__(
+        self,
+        customer: Customer,
+        items: dict[str, int],
+        order_id: typing.Optional[int] = None,
+    ):
         self.customer = customer
         self.time = time.time()
         self.completed_time = None
         self.status = Status.PENDING
         self.items = items
         self.is_home_delivery = False
-        self.id = random.randint(1000, 9999)
+        self.id = order_id
+        self.cached_cost = None
+        self.cached_cost_key = None
 
     # allows for us to print the Order object in a readable format
     def __str__(self):
@@ -151,29 +228,26 @@ class Order:
     # returns a condensed version of the order
     # e.g. "1234|2021-09-01 12:00:00| John Doe - {'Pepperoni': 2, 'Hawaiian': 1} - PENDING"
     def small_repr(self):
-        time_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.time))
-        return (
-            f"{self.id}|{time_str}| {self.customer} - {self.items} - {self.status.name}"
-        )
+        time_str = format_timestamp(int(self.time))
+        return f"{self.id}|{time_str}| {self.customer} - {self.items} - {status_names[self.status]}"
 
     # returns a full version of the order, with all details
     def full_repr(self):
-        time_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.time))
+        time_str = format_timestamp(int(self.time))
         lines = [
             f"Order {self.id} for {self.customer} at {time_str}",
             "Items:",
         ]
         for item, count in self.items.items():
+            menu_item = all_items[item]
             lines.append(
-                f"\t- {item} x {count} (${all_items[item].price:.2f} each, ${all_items[item].price * count:.2f} total)"
+                f"\t- {item} x {count} (${menu_item.price_str} each, ${menu_item.price * count:.2f} total)"
             )
-        lines.append(f"Status: {self.status.name}")
+        lines.append(f"Status: {status_names[self.status]}")
         if self.is_home_delivery:
             lines.append("Home delivery")
         if self.status == Status.DONE:
-            completed_time_str = time.strftime(
-                "%Y-%m-%d %H:%M:%S", time.localtime(self.completed_time)
-            )
+            completed_time_str = format_timestamp(int(self.completed_time))
             lines.append(f"Completed at {completed_time_str}")
         costs = self.cost()
         lines.append(f"Gross: ${costs.raw_cost:.2f}")
@@ -199,40 +273,64 @@ class Order:
         self.status = Status.DONE
         self.completed_time = time.time()
 
+    # returns the cost of the order as an OrderCost object
+    # the result is cached and only recalculated if the discount eligibility or delivery changes
+    def cost(self) -> OrderCost:
+        cost_key = (self.customer.loyalty_member, self.is_home_delivery)
+        if self.cached_cost is None or self.cached_cost_key != cost_key:
+            self.cached_cost = self.calculate_cost()
+            self.cached_cost_key = cost_key
+        return self.cached_cost
+
     # calculates the cost of the order
     # returns an OrderCost object
-    def cost(self) -> OrderCost:
-        costing = OrderCost()
-        for item, count in self.items.items():
-            costing.add_items(item, count)
-        if self.customer.is_eligible_for_discount() and costing.can_discount_apply():
-            costing.add_discount()
-        if self.is_home_delivery:
-            costing.add_deliver_cost()
-        costing.get_total_cost()
-        return costing
+    def calculate_cost(self) -> OrderCost:
+        raw_cost = sum(
+            (item_prices[item] * count for item, count in self.items.items()), 0.0
+        )
+        discount = 0.0
+        if self.customer.loyalty_member and raw_cost > discount_threshold:
+            discount = raw_cost * discount_rate
+        delivery_cost = delivery_fee if self.is_home_delivery else 0.0
+        cost_before_gst = raw_cost - discount + delivery_cost
+        gst = cost_before_gst * gst_rate
+        return OrderCost(
+            raw_cost,
+            discount,
+            delivery_cost,
+            cost_before_gst,
+            gst,
+            cost_before_gst + gst,
+        )
 
     # serializes the order to a JSON object for saving/loading
     def toJSON(self):
         return {
             "customer": self.customer.phone,
             "time": self.time,
-            "status": self.status.name,
-            "items": {item: count for item, count in self.items.items()},
+            "status": status_names[self.status],
+            "items": self.items,
             "is_home_delivery": self.is_home_delivery,
             "id": self.id,
             "completed_time": self.completed_time,
         }
 
-    # deserializes the order from a JSON object
-    # note: will not set the customer, as it is not stored in the JSON object
-    def fromJSON(self, data):
-        self.time = data["time"]
-        self.status = Status[data["status"]]
-        self.is_home_delivery = data["is_home_delivery"]
-        self.id = data["id"]
-        if "completed_time" in data:
-            self.completed_time = data["completed_time"]
+    # creates an order for a customer from a JSON object, the counterpart of toJSON
+    # the customer is passed in, as only their phone number is stored in the JSON object
+    # skips __init__, as the time and id it sets would be replaced straight away
+    @classmethod
+    def from_dict(cls, customer: Customer, data) -> "Order":
+        order = cls.__new__(cls)
+        order.customer = customer
+        order.items = data["items"]
+        order.time = data["time"]
+        order.completed_time = data.get("completed_time")
+        order.status = statuses_by_name[data["status"]]
+        order.is_home_delivery = data["is_home_delivery"]
+        order.id = data["id"]
+        order.cached_cost = None
+        order.cached_cost_key = None
+        return order
 
 
 # Abstract class for a store that can store and retrieve orders and customers
@@ -242,9 +340,14 @@ class IStore(ABC):
     def get_all_time_orders(self) -> list[Order]:
         pass
 
-    # get_date_orders: returns all orders placed on a given day
+    # get_order_by_id: returns an order by its id, or None if not found
     @abstractmethod
-    def get_date_orders(self, time: float = time.time()) -> list[Order]:
+    def get_order_by_id(self, order_id: int) -> typing.Optional[Order]:
+        pass
+
+    # get_date_orders: returns all orders placed on the day of timestamp t, or today if t is None
+    @abstractmethod
+    def get_date_orders(self, t: typing.Optional[float] = None) -> list[Order]:
         pass
 
     # add_order: adds an order to the store
@@ -254,6 +357,11 @@ class IStore(ABC):
     ) -> Order:
         pass
 
+    # add_orders_bulk: adds many already created orders to the store at once
+    @abstractmethod
+    def add_orders_bulk(self, orders: typing.Iterable[Order]):
+        pass
+
     # get_customer: returns a customer by phone number
     @abstractmethod
     def get_customer(self, phone: str) -> typing.Optional[Customer]:
@@ -264,12 +372,22 @@ class IStore(ABC):
     def customer_phones(self) -> list[Customer]:
         pass
 
+    # random_customers: returns count customers picked at random (with repeats), used to generate fake data
+    @abstractmethod
+    def random_customers(self, count: int) -> list[Customer]:
+        pass
+
     # set_customer_loyalty: sets a customer's loyalty status
     # can return an error if the customer already exists
     @abstractmethod
     def add_customer(self, customer: Customer):
         pass
 
+    # add_customers_bulk: adds many customers at once, skipping any whose phone number already exists
+    @abstractmethod
+    def add_customers_bulk(self, customers: typing.Iterable[Customer]):
+        pass
+
     # get_or_add_customer: returns a customer by phone number, or creates a new one if not found
     @abstractmethod
     def get_or_add_customer(self, phone: str, name: str) -> Customer:
@@ -280,40 +398,100 @@ class IStore(ABC):
     def clear_orders(self):
         pass
 
+    # mark_dirty: records that stored data was changed outside of the store's methods
+    # e.g. an order's status or a customer's loyalty, so the store knows to save it
+    @abstractmethod
+    def mark_dirty(self):
+        pass
+
+    # flush: persists any changes that have not been saved yet
+    @abstractmethod
+    def flush(self):
+        pass
+
+    # batch: a context manager that groups many changes together, i.e. `with store.batch(): ...`
+    # stores can use this to persist the changes once at the end instead of after each change
+    @abstractmethod
+    def batch(self) -> typing.ContextManager[None]:
+        pass
+
 
 # a class used to store PURELY data about the customers and orders
 class FileSystemStoreData:
     # phone number to customer
     all_customers: dict[str, Customer]
-    active_orders: list[Order]
+    # order id to order, in the order they were added
+    active_orders: dict[int, Order]
+    # date (see date_key) to the orders placed on that day, kept in sync with active_orders
+    orders_by_date: dict[str, list[Order]]
+    # the id the next new order will get, ids are never reused so orders can't clash
+    next_order_id: int
 
     def __init__(self):
         self.all_customers = {}
-        self.active_orders = []
+        self.active_orders = {}
+        self.orders_by_date = {}
+        self.next_order_id = first_order_id
 
-    def toJSON(self):
-        all_customers = {
-            k: {"name": v.name, "phone": v.phone, "loyalty_member": v.loyalty_member}
-            for k, v in self.all_customers.items()
-        }
-        active_orders = [order.toJSON() for order in self.active_orders]
+    # adds an order to active_orders and the date index
+    def add_order(self, order: Order):
+        self.active_orders[order.id] = order
+        self.orders_by_date.setdefault(date_key(order.time), []).append(order)
 
-        return {
-            "all_customers": all_customers,
-            "active_orders": active_orders,
-        }
+    # gives a new order the next unused id
+    def assign_new_id(self, order: Order):
+        order.id = self.next_order_id
+        self.next_order_id += 1
+
+    # removes all orders and clears the date index
+    def clear_orders(self):
+        self.active_orders.clear()
+        self.orders_by_date.clear()
+
+    # serializes the store data as JSON to a binary file, the counterpart of fromJSON
+    # written one customer or order at a time so a large store is never held in memory as a single encoded string
+    # each customer and order is serialized through its toJSON method by dump_json
+    def write_json(self, file: typing.BinaryIO):
+        file.write(b'{"all_customers":{')
+        for i, (phone, customer) in enumerate(self.all_customers.items()):
+            if i > 0:
+                file.write(b",")
+            file.write(dump_json(phone))
+            file.write(b":")
+            file.write(dump_json(customer))
+        file.write(b'},"active_orders":[')
+        for i, order in enumerate(self.active_orders.values()):
+            if i > 0:
+                file.write(b",")
+            file.write(dump_json(order))
+        file.write(b'],"next_order_id":')
+        file.write(dump_json(self.next_order_id))
+        file.write(b"}")
 
     def fromJSON(self, data):
-        self.all_customers = {
-            k: Customer(v["name"], v["phone"]) for k, v in data["all_customers"].items()
-        }
+        self.all_customers = {}
+        for k, v in data["all_customers"].items():
+            customer = Customer(v["name"], v["phone"])
+            customer.set_loyalty_member(v.get("loyalty_member", False))
+            self.all_customers[k] = customer
+        # older stores used random ids, which could clash
+        # orders with an id that is already taken are given a new id once all orders are loaded
+        clashing_orders = []
         for order in data["active_orders"]:
             customer = self.all_customers[order["customer"]]
-            new_order = Order(
-                customer, {item: count for item, count in order["items"].items()}
-            )
-            new_order.fromJSON(order)
-            self.active_orders.append(new_order)
+            new_order = Order.from_dict(customer, order)
+            if new_order.id in self.active_orders:
+                clashing_orders.append(new_order)
+            else:
+                self.add_order(new_order)
+        # older stores also didn't save the counter, so carry on after the largest id
+        self.next_order_id = max(
+            data.get("next_order_id", first_order_id),
+            max(self.active_orders, default=first_order_id - 1) + 1,
+        )
+        for order in clashing_orders:
+            self.assign_new_id(order)
+            self.add_order(order)
 
 
 # exception class for data errors in the store
@@ -330,37 +508,168 @@ class FileSystemStore(IStore):
 
     file_path: str
 
+    # the shortest time in seconds between two saves caused by mark_dirty
+    save_interval = 0.5
+
+    # whether there are changes that haven't been saved to the file yet
+    dirty: bool
+    # how many batch() blocks are currently open, changes are only saved once this is 0
+    batch_depth: int
+    # when the data was last saved, used to space out saves when many changes happen quickly
+    last_save_time: float
+    # all customers as a tuple for random_customers, None when customers have changed since
+    customer_tuple: typing.Optional[tuple[Customer, ...]]
+
+    # new customers are appended to a journal file next to the store file as they are added
+    # instead of rewriting the whole store, the journal is emptied whenever the store is saved
+    journal_path: str
+    # the journal opened for appending, only opened once the first customer is added
+    journal: typing.Optional[typing.BinaryIO]
+    # how many customers are in the journal but not in the store file yet
+    journal_entries: int
+    # the store is saved to empty the journal once it holds this many customers,
+    # otherwise it is only emptied by another save or when the program exits
+    max_journal_entries = 1000
+
     def __init__(self, file_path: str = "store.json"):
         self.file_path = file_path
         self.data = FileSystemStoreData()
+        self.dirty = False
+        self.batch_depth = 0
+        self.last_save_time = 0.0
+        self.customer_tuple = None
+        self.journal_path = file_path + ".log"
+        self.journal = None
+        self.journal_entries = 0
 
         # check if file exists
         if os.path.exists(file_path):
             self.load()
+        if os.path.exists(self.journal_path):
+            self.replay_journal()
+
+        # make sure changes that are still waiting to be saved aren't lost when the program exits
+        atexit.register(self.close)
 
     # loads data from the file, don't usually need to call this directly as the contructor does it
     def load(self):
-        with open(self.file_path, "r") as file:
+        with open(self.file_path, "rb") as file:
             data = file.read()
-            self.data.fromJSON(json.loads(data))
+            self.data.fromJSON(load_json(data))
+        self.customer_tuple = None
 
     # saves data to the file
+    # the data is written to a temporary file first and then moved over the old file,
+    # so the store file is never left half written if the program stops while saving
+    # the temporary file is synced to disk before the move so a crash can't leave an empty file
     def save(self):
-        with open(self.file_path, "w") as file:
-            file.write(json.dumps(self.data.toJSON()))
+        temp_path = self.file_path + ".tmp"
+        try:
+            with open(temp_path, "wb") as file:
+                self.data.write_json(file)
+                file.flush()
+                os.fsync(file.fileno())
+        except BaseException:
+            # don't leave a half written temporary file behind, if it was created at all
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temp_path)
+            raise
+        os.replace(temp_path, self.file_path)
+        self.dirty = False
+        self.last_save_time = time.time()
+        # everything in the journal is in the store file now
+        self.journal_entries = 0
+        if self.journal is not None:
+            self.journal.truncate(0)
+        elif os.path.exists(self.journal_path):
+            open(self.journal_path, "wb").close()
+
+    # appends a new customer to the journal, so it is kept without saving the whole store
+    def journal_customer(self, customer: Customer):
+        if self.journal is None:
+            self.journal = open(self.journal_path, "ab", buffering=0)
+        entry = {
+            "op": "add_customer",
+            "name": customer.name,
+            "phone": customer.phone,
+            "loyalty_member": customer.loyalty_member,
+        }
+        self.journal.write(dump_json(entry) + b"\n")
+        self.journal_entries += 1
+
+    # saves the store if the journal has grown too long, which empties it
+    def check_journal_size(self):
+        if self.journal_entries >= self.max_journal_entries:
+            self.mark_dirty()
+
+    # adds the customers from the journal that aren't in the store file yet
+    # they stay in the journal until the store is next saved
+    def replay_journal(self):
+        with open(self.journal_path, "rb") as file:
+            for line in file:
+                try:
+                    entry = load_json(line)
+                except ValueError:
+                    # the last line can be cut off if the program stopped while writing it
+                    break
+                if entry["op"] == "add_customer":
+                    if entry["phone"] not in self.data.all_customers:
+                        customer = Customer(entry["name"], entry["phone"])
+                        customer.set_loyalty_member(entry.get("loyalty_member", False))
+                        self.data.all_customers[customer.phone] = customer
+                self.journal_entries += 1
+        self.customer_tuple = None
+        if self.journal_entries >= self.max_journal_entries:
+            self.dirty = True
+
+    # saves data to the file only if something has changed since the last save
+    # customers that are only in the journal don't count, they are already kept on disk
+    def flush(self):
+        if self.dirty:
+            self.save()
+
+    # saves the store if anything isn't in the store file yet, including the journal, and closes the journal
+    # called when the program exits
+    def close(self):
+        if self.dirty or self.journal_entries > 0:
+            self.save()
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    # records that the data has changed
+    # saves straight away, unless inside a batch or the last save was less than save_interval ago
+    # in which case the change is saved by a later change, the end of the batch or flush()
+    # the interactive cli flushes after every command, so a change isn't left unsaved at the prompt
+    def mark_dirty(self):
+        self.dirty = True
+        if (
+            self.batch_depth == 0
+            and time.time() - self.last_save_time >= self.save_interval
+        ):
+            self.flush()
+
+    @contextlib.contextmanager
+    def batch(self) -> typing.Iterator[None]:
+        self.batch_depth += 1
+        try:
+            yield
+        finally:
+            self.batch_depth -= 1
+            if self.batch_depth == 0:
+                self.flush()
 
     def get_all_time_orders(self) -> list[Order]:
-        all_orders = list(self.data.active_orders)
+        all_orders = list(self.data.active_orders.values())
         return all_orders
 
-    def get_date_orders(self, t: float = time.time()) -> list[Order]:
-        day = time.localtime(t).tm_yday
-        today_orders = [
-            order
-            for order in self.data.active_orders
-            if time.localtime(order.time).tm_yday == day
-        ]
-        return today_orders
+    def get_order_by_id(self, order_id: int) -> typing.Optional[Order]:
+        return self.data.active_orders.get(order_id)
+
+    def get_date_orders(self, t: typing.Optional[float] = None) -> list[Order]:
+        if t is None:
+            t = time.time()
+        return list(self.data.orders_by_date.get(date_key(t), []))
 
     def add_order(
         self, customer: Customer, items: list[Item], is_home_delivery: bool
@@ -368,39 +677,67 @@ class FileSystemStore(IStore):
         order = Order(customer, items)
         order.is_home_delivery = is_home_delivery
 
-        self.data.active_orders.append(order)
-        self.save()
+        self.data.assign_new_id(order)
+        self.data.add_order(order)
+        self.mark_dirty()
 
         return order
 
+    def add_orders_bulk(self, orders: typing.Iterable[Order]):
+        with self.batch():
+            for order in orders:
+                self.data.assign_new_id(order)
+                self.data.add_order(order)
+                self.mark_dirty()
+
     def get_customer(self, phone: str) -> typing.Optional[Customer]:
         return self.data.all_customers.get(phone)
 
     def customer_phones(self) -> list[str]:
         return list(self.data.all_customers.keys())
 
+    def random_customers(self, count: int) -> list[Customer]:
+        if self.customer_tuple is None:
+            self.customer_tuple = tuple(self.data.all_customers.values())
+        return random.choices(self.customer_tuple, k=count)
+
     def add_customer(self, customer: Customer):
         if customer.phone in self.data.all_customers:
             raise DataError("Customer already exists")
+        # journaled first, so a customer that couldn't be written isn't added
+        self.journal_customer(customer)
         self.data.all_customers[customer.phone] = customer
-        self.save()
+        self.customer_tuple = None
+        self.check_journal_size()
+
+    def add_customers_bulk(self, customers: typing.Iterable[Customer]):
+        all_customers = self.data.all_customers
+        new_customers = {}
+        for customer in customers:
+            if customer.phone not in all_customers:
+                new_customers.setdefault(customer.phone, customer)
+        all_customers.update(new_customers)
+        self.customer_tuple = None
+        self.mark_dirty()
 
     def get_or_add_customer(self, phone: str, name: str) -> Customer:
         customer = self.data.all_customers.get(phone)
         if not customer:
             customer = Customer(name, phone)
+            self.journal_customer(customer)
             self.data.all_customers[phone] = customer
-            self.save()
+            self.customer_tuple = None
+            self.check_journal_size()
         return customer
 
     def set_customer_loyalty(self, phone: str, is_member: bool):
         customer = self.data.all_customers.get(phone)
         if customer:
             customer.set_loyalty_member(is_member)
-            self.save()
+            self.mark_dirty()
         else:
             print("Customer not found")
 
     def clear_orders(self):
-        self.data.active_orders.clear()
-        self.save()
+        self.data.clear_orders()
+        self.mark_dirty()
@@ -1,25 +1,48 @@
-from faker import Faker
 from database import IStore, Customer, all_items
 
-fake = Faker()
+import random
+import time
+
+# the Faker instance, only created when fake data is first needed
+# importing faker loads a lot of modules, which would slow down starting the program otherwise
+fake = None
+
+
+# returns the Faker instance, creating it the first time
+def get_fake():
+    global fake
+    if fake is None:
+        from faker import Faker
+
+        fake = Faker()
+    return fake
+
+
+# the menu item names, as a tuple so random.choices can index into it
+item_names = tuple(all_items.keys())
 
 
 # generates fake data for testing
 def fake_customer() -> Customer:
+    fake = get_fake()
     customer = Customer(fake.name(), fake.phone_number())
     customer.set_loyalty_member(fake.boolean())
     return customer
 
 
 # generates fake data for testing
+# uses the random module directly as this is called for every fake order,
+# going through faker's providers for each value is a lot slower
 def fake_order() -> tuple[dict[str, int], bool, float]:
-    items = dict()
-    for _ in range(fake.random_int(1, 5)):
-        item = fake.random_element(all_items.keys())
-        items[item] = fake.random_int(1, 5)
-    home_delivery = fake.boolean()
+    item_count = random.randint(1, 5)
+    chosen_items = random.choices(item_names, k=item_count)
+    counts = [random.randint(1, 5) for _ in range(item_count)]
+    items = dict(zip(chosen_items, counts))
+    home_delivery = random.random() < 0.5
+    # some time in the last week
+    order_time = time.time() - random.random() * 7 * 24 * 60 * 60
     return (
         items,
         home_delivery,
-        fake.date_time_between(start_date="-1w", end_date="now").timestamp(),
+        order_time,
     )
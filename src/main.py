@@ -6,10 +6,8 @@ def main():
     # instantiate a FileSystemStore and a Context object to run the command line interface
     store = FileSystemStore("pizza.json")
     context = Context(store)
-    # blocks until the user exits the program
+    # blocks until the user exits the program, saving anything not already saved
     loop(context)
-    # and saves if not already saved
-    store.save()
 
 
 if __name__ == "__main__":